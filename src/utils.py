@@ -1,15 +1,60 @@
 import os
+import re
 import sys
+import time
 import glob
 import json
-import datetime
-from collections import Counter
+from array import array
 from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
+from typing import Optional
 
+import numpy as np
 import pandas as pd
-from matplotlib import pyplot as plt
-import seaborn as sns
-from nltk.corpus import stopwords
+
+__all__ = [
+    "get_stopwords",
+    "break_combined_weeks",
+    "get_msgs_df_info",
+    "get_messages_dict",
+    "from_msg_get_replies",
+    "msgs_to_df",
+    "process_msgs",
+    "get_messages_from_channel",
+    "convert_2_timestamp",
+    "get_tagged_users",
+    "map_userid_2_realname",
+]
+
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    # stdlib json also accepts bytes, just parses them more slowly
+    _json_loads = json.loads
+
+_STOPWORDS = None
+
+_MENTION_RE = re.compile(r"@U\w+")
+
+
+def get_stopwords():
+    """
+    Returns the English stopwords, loaded from nltk on first use.
+
+    Returns:
+        frozenset of stopwords, empty if the nltk corpus is not available
+    """
+    global _STOPWORDS
+    if _STOPWORDS is None:
+        from nltk.corpus import stopwords
+        try:
+            _STOPWORDS = frozenset(stopwords.words("english"))
+        except LookupError:
+            # the corpus has not been downloaded, try again on the next call
+            return frozenset()
+    return _STOPWORDS
 
 
 def break_combined_weeks(combined_weeks):
@@ -36,108 +81,133 @@ def break_combined_weeks(combined_weeks):
     return plus_one_week, minus_one_week
 
 def get_msgs_df_info(df):
-    msgs_count_dict = df.user.value_counts().to_dict()
-    replies_count_dict = dict(Counter([u for r in df.replies if r != None for u in r]))
-    mentions_count_dict = dict(Counter([u for m in df.mentions if m != None for u in m]))
-    links_count_dict = df.groupby("user").link_count.sum().to_dict()
+    # the counts end up in dicts, so skip the value_counts/groupby key sorts
+    msgs_count_dict = df.user.value_counts(sort=False).to_dict()
+    replies_count_dict = Counter(
+        chain.from_iterable(r for r in df.replies if r is not None)
+    )
+    mentions_count_dict = Counter(
+        chain.from_iterable(m for m in df.mentions if m is not None)
+    )
+    links_count_dict = df.groupby("user", sort=False).link_count.sum().to_dict()
     return msgs_count_dict, replies_count_dict, mentions_count_dict, links_count_dict
 
 
 
 def get_messages_dict(msgs):
-    msg_list = {
-            "msg_id":[],
-            "text":[],
-            "attachments":[],
-            "user":[],
-            "mentions":[],
-            "emojis":[],
-            "reactions":[],
-            "replies":[],
-            "replies_to":[],
-            "ts":[],
-            "links":[],
-            "link_count":[]
-            }
+    msg_id = []
+    text = []
+    attachments = []
+    user = []
+    mentions = []
+    emojis = []
+    reactions = []
+    replies = []
+    replies_to = []
+    ts = []
+    links = []
+    # typed C ints rather than one Python int object per message
+    link_count = array("i")
 
+    # user ids repeat across many messages, share one str object per id
+    intern = sys.intern
 
     for msg in msgs:
-        if "subtype" not in msg:
-            try:
-                msg_list["msg_id"].append(msg["client_msg_id"])
-            except:
-                msg_list["msg_id"].append(None)
-            
-            msg_list["text"].append(msg["text"])
-            msg_list["user"].append(msg["user"])
-            msg_list["ts"].append(msg["ts"])
-            
-            if "reactions" in msg:
-                msg_list["reactions"].append(msg["reactions"])
-            else:
-                msg_list["reactions"].append(None)
-
-            if "parent_user_id" in msg:
-                msg_list["replies_to"].append(msg["ts"])
-            else:
-                msg_list["replies_to"].append(None)
-
-            if "thread_ts" in msg and "reply_users" in msg:
-                msg_list["replies"].append(msg["replies"])
-            else:
-                msg_list["replies"].append(None)
-            
-            if "blocks" in msg:
-                emoji_list = []
-                mention_list = []
-                link_count = 0
-                links = []
-                
-                for blk in msg["blocks"]:
-                    if "elements" in blk:
-                        for elm in blk["elements"]:
-                            if "elements" in elm:
-                                for elm_ in elm["elements"]:
-                                    
-                                    if "type" in elm_:
-                                        if elm_["type"] == "emoji":
-                                            emoji_list.append(elm_["name"])
-
-                                        if elm_["type"] == "user":
-                                            mention_list.append(elm_["user_id"])
-                                        
-                                        if elm_["type"] == "link":
-                                            link_count += 1
-                                            links.append(elm_["url"])
-
-
-                msg_list["emojis"].append(emoji_list)
-                msg_list["mentions"].append(mention_list)
-                msg_list["links"].append(links)
-                msg_list["link_count"].append(link_count)
-            else:
-                msg_list["emojis"].append(None)
-                msg_list["mentions"].append(None)
-                msg_list["links"].append(None)
-                msg_list["link_count"].append(0)
-    
-    return msg_list
+        if msg.get("subtype") is not None:
+            continue
+
+        msg_id.append(msg.get("client_msg_id"))
+
+        msg_ts = msg["ts"]
+        text.append(msg["text"])
+        attachments.append(msg.get("attachments"))
+        user.append(intern(msg["user"]))
+        ts.append(msg_ts)
+        reactions.append(msg.get("reactions"))
+        replies_to.append(msg_ts if "parent_user_id" in msg else None)
+
+        if "thread_ts" in msg and "reply_users" in msg:
+            replies.append(msg["replies"])
+        else:
+            replies.append(None)
+
+        blocks = msg.get("blocks")
+        if blocks is None:
+            emojis.append(None)
+            mentions.append(None)
+            links.append(None)
+            link_count.append(0)
+            continue
+
+        emoji_list = []
+        mention_list = []
+        msg_links = []
+
+        for blk in blocks:
+            for elm in blk.get("elements", ()):
+                for elm_ in elm.get("elements", ()):
+                    elm_type = elm_.get("type")
+                    if elm_type == "emoji":
+                        emoji_list.append(elm_["name"])
+                    elif elm_type == "user":
+                        mention_list.append(intern(elm_["user_id"]))
+                    elif elm_type == "link":
+                        msg_links.append(elm_["url"])
+
+        emojis.append(emoji_list)
+        mentions.append(mention_list)
+        links.append(msg_links)
+        link_count.append(len(msg_links))
+
+    return {
+        "msg_id": msg_id,
+        "text": text,
+        "attachments": attachments,
+        "user": user,
+        "mentions": mentions,
+        "emojis": emojis,
+        "reactions": reactions,
+        "replies": replies,
+        "replies_to": replies_to,
+        "ts": ts,
+        "links": links,
+        "link_count": np.frombuffer(link_count, dtype=np.int32).copy(),
+    }
 
 def from_msg_get_replies(msg):
     replies = []
-    if "thread_ts" in msg and "replies" in msg:
-        try:
-            for reply in msg["replies"]:
-                reply["thread_ts"] = msg["thread_ts"]
-                reply["message_id"] = msg["client_msg_id"]
-                replies.append(reply)
-        except:
-            pass
+    replies_raw = msg.get("replies")
+    thread_ts = msg.get("thread_ts")
+    if replies_raw and thread_ts is not None:
+        cmid = msg.get("client_msg_id")
+        # build new dicts rather than mutating the caller's reply payloads
+        for reply in replies_raw:
+            replies.append({**reply, "thread_ts": thread_ts, "message_id": cmid})
     return replies
 
+def _object_array(values):
+    # np.asarray would turn equal-length lists (e.g. [[], []]) into a 2-D array
+    arr = np.empty(len(values), dtype=object)
+    arr[:] = values
+    return arr
+
 def msgs_to_df(msgs):
+    '''
+    build a DataFrame of messages, one column per field of get_messages_dict
+
+    each column is passed as its own 1-D array, so the frame keeps a separate
+    contiguous block per dtype (int link_count, object for the rest) rather
+    than a single 2-D object block; column aggregations stay cheap
+    '''
     msg_list = get_messages_dict(msgs)
-    df = pd.DataFrame(msg_list)
+    # the schema is fixed: link_count is an int, every other column is pinned to
+    # object so pandas never re-infers them (pandas 3 would otherwise turn the
+    # string columns into str dtype and None into NaN)
+    columns = {
+        k: _object_array(v) for k, v in msg_list.items() if k != "link_count"
+    }
+    df = pd.DataFrame(columns, dtype=object, copy=False)
+    df["link_count"] = np.asarray(msg_list["link_count"], dtype=np.int32)
     return df
 
 def process_msgs(msg):
@@ -152,31 +222,119 @@ def process_msgs(msg):
 
     return msg_list, rply_list
 
+def _load_json(path):
+    with open(path, "rb") as f:
+        return _json_loads(f.read())
+
 def get_messages_from_channel(channel_path):
     '''
     get all the messages from a channel        
     '''
-    channel_json_files = os.listdir(channel_path)
-    channel_msgs = [json.load(open(channel_path + "/" + f)) for f in channel_json_files]
+    channel_json_files = [
+        entry.path for entry in os.scandir(channel_path)
+        if entry.name.endswith(".json")
+    ]
+    # the daily files are independent, so read and parse them concurrently
+    max_workers = min(32, (os.cpu_count() or 1) * 2)
+    with ThreadPoolExecutor(max_workers=max_workers) as ex:
+        channel_msgs = list(ex.map(_load_json, channel_json_files))
 
-    df = pd.concat([pd.DataFrame(get_messages_dict(msgs)) for msgs in channel_msgs])
+    # one frame over all files rather than a frame per file plus a concat
+    df = msgs_to_df(chain.from_iterable(channel_msgs))
     print(f"Number of messages in channel: {len(df)}")
     
     return df
 
 
+def _local_utc_offsets(secs):
+    # the local UTC offset only moves at DST transitions, so look it up once per
+    # day and fall back to quarter-hour buckets only on days where it changes
+    days, day_idx = np.unique(secs // 86400, return_inverse=True)
+    day_start = (days * 86400).tolist()
+    start = np.array([time.localtime(s).tm_gmtoff for s in day_start], dtype=np.int64)
+    end = np.array(
+        [time.localtime(s + 86399).tm_gmtoff for s in day_start], dtype=np.int64
+    )
+    offsets = start[day_idx]
+    mixed = np.flatnonzero((start != end)[day_idx])
+    if mixed.size:
+        buckets, bucket_idx = np.unique(secs[mixed] // 900, return_inverse=True)
+        bucket_offsets = np.array(
+            [time.localtime(b * 900).tm_gmtoff for b in buckets.tolist()],
+            dtype=np.int64,
+        )
+        offsets[mixed] = bucket_offsets[bucket_idx]
+    return offsets
+
 def convert_2_timestamp(column, data):
     """convert from unix time to readable timestamp
         args: column: columns that needs to be converted to timestamp
                 data: data that has the specified column
     """
     if column in data.columns.values:
-        timestamp_ = []
-        for time_unix in data[column]:
-            if time_unix == 0:
-                timestamp_.append(0)
-            else:
-                a = datetime.datetime.fromtimestamp(float(time_unix))
-                timestamp_.append(a.strftime('%Y-%m-%d %H:%M:%S'))
+        time_unix = pd.to_numeric(data[column], errors="coerce").fillna(0).to_numpy(
+            dtype=np.float64
+        )
+        # fromtimestamp rounds to microseconds, strftime then drops the fraction
+        secs = np.floor(np.round(time_unix, 6)).astype(np.int64)
+        local = (secs + _local_utc_offsets(secs)).astype("datetime64[s]")
+        timestamp_ = [
+            t.replace("T", " ") for t in np.datetime_as_string(local, unit="s").tolist()
+        ]
+        # zero marks a missing time, keep it as 0 rather than the epoch
+        for i in np.flatnonzero(time_unix == 0).tolist():
+            timestamp_[i] = 0
         return timestamp_
     else: print(f"{column} not in data")
+
+def get_tagged_users(df):
+    """get all @ in the messages"""
+
+    return df['msg_content'].fillna('').str.findall(_MENTION_RE)
+
+def map_userid_2_realname(
+    user_profile: dict,
+    comm_dict: dict,
+    plot=False,
+    top_n: Optional[int] = None,
+    return_ax: bool = False,
+):
+    """
+    map slack_id to realnames
+    user_profile: a dictionary that contains users info such as real_names
+    comm_dict: a dictionary that contains slack_id and total_message sent by
+        that slack_id
+    top_n: keep only the top_n users by message count, all users if None
+    plot: draw a bar chart of the mapping, matplotlib is only imported then
+    return_ax: return (DataFrame, Axes) instead of the DataFrame alone; the
+        Axes is None when plot is False
+    """
+    id2name = dict(
+        zip(user_profile['id'], [p['real_name'] for p in user_profile['profile']])
+    )
+
+    # to store mapping
+    ac = {id2name[k]: v for k, v in comm_dict.items() if k in id2name}
+
+    ac_comm_dict = pd.DataFrame(
+        {'LearnerName': list(ac), '# of Msg sent in Threads': list(ac.values())}
+    )
+    if top_n is not None:
+        # partial selection, no need to sort the whole frame for the top few
+        ac_comm_dict = ac_comm_dict.nlargest(top_n, '# of Msg sent in Threads')
+    else:
+        ac_comm_dict = ac_comm_dict.sort_values(
+            by='# of Msg sent in Threads', ascending=False
+        )
+
+    ax = None
+    if plot:
+        # pandas pulls in matplotlib only here, so importing utils stays cheap
+        ax = ac_comm_dict.plot.bar(
+            figsize=(15, 7.5), x='LearnerName', y='# of Msg sent in Threads'
+        )
+        ax.set_title('Student based on Message sent in thread', size=20)
+
+    if return_ax:
+        return ac_comm_dict, ax
+    return ac_comm_dict
@@ -0,0 +1,274 @@
+import datetime
+import json
+import time
+
+import pandas as pd
+import pytest
+
+import src.utils as utils
+from src.utils import (
+    convert_2_timestamp,
+    from_msg_get_replies,
+    get_messages_from_channel,
+    get_msgs_df_info,
+    get_stopwords,
+    get_tagged_users,
+    map_userid_2_realname,
+    msgs_to_df,
+)
+
+
+def _msg(**kwargs):
+    msg = {"client_msg_id": "m1", "text": "hello", "user": "U1", "ts": "1600000000.0"}
+    msg.update(kwargs)
+    return msg
+
+
+def test_msgs_to_df_equal_length_list_columns():
+    blocks = [{"elements": [{"elements": [{"type": "text", "text": "hello"}]}]}]
+    df = msgs_to_df([_msg(blocks=blocks), _msg(client_msg_id="m2", blocks=blocks)])
+
+    assert len(df) == 2
+    assert df["links"].tolist() == [[], []]
+    assert df["mentions"].tolist() == [[], []]
+    assert df["link_count"].tolist() == [0, 0]
+
+
+def test_msgs_to_df_single_message_without_links():
+    blocks = [{"elements": [{"elements": []}]}]
+    df = msgs_to_df([_msg(blocks=blocks)])
+
+    assert df["links"].tolist() == [[]]
+
+
+def test_msgs_to_df_attachments_column():
+    msgs = [_msg(attachments=[{"id": 1}]), _msg(client_msg_id="m2")]
+    df = msgs_to_df(msgs)
+
+    assert len(df) == 2
+    assert df["attachments"].tolist() == [[{"id": 1}], None]
+
+
+def test_msgs_to_df_skips_subtype_messages():
+    df = msgs_to_df([_msg(), _msg(subtype="channel_join")])
+
+    assert len(df) == 1
+    assert isinstance(df, pd.DataFrame)
+
+
+def test_msgs_to_df_column_dtypes():
+    df = msgs_to_df([_msg(client_msg_id=None), _msg(client_msg_id="m2")])
+
+    assert df["link_count"].dtype == "int32"
+    for col in ["msg_id", "text", "user", "ts", "links"]:
+        assert df[col].dtype == object
+    assert df["msg_id"].tolist() == [None, "m2"]
+    assert list(df.columns)[-1] == "link_count"
+
+
+def test_get_msgs_df_info_counts():
+    blocks = [{"elements": [{"elements": [
+        {"type": "user", "user_id": "U3"},
+        {"type": "link", "url": "http://a"},
+    ]}]}]
+    msgs = [
+        _msg(thread_ts="1", reply_users=["U2"], replies=["U2", "U3"], blocks=blocks),
+        _msg(client_msg_id="m2", user="U2"),
+        _msg(client_msg_id="m3"),
+    ]
+    counts = get_msgs_df_info(msgs_to_df(msgs))
+    msgs_count, replies_count, mentions_count, links_count = counts
+
+    assert msgs_count == {"U1": 2, "U2": 1}
+    assert replies_count == {"U2": 1, "U3": 1}
+    assert mentions_count == {"U3": 1}
+    assert links_count == {"U1": 1, "U2": 0}
+
+
+def test_msgs_to_df_block_elements():
+    blocks = [{"elements": [{"elements": [
+        {"type": "emoji", "name": "smile"},
+        {"type": "user", "user_id": "U3"},
+        {"type": "link", "url": "http://a"},
+        {"type": "link", "url": "http://b"},
+        {"type": "text", "text": "hi"},
+    ]}]}]
+    df = msgs_to_df([_msg(blocks=blocks), _msg(client_msg_id="m2")])
+
+    assert df["emojis"].tolist() == [["smile"], None]
+    assert df["mentions"].tolist() == [["U3"], None]
+    assert df["links"].tolist() == [["http://a", "http://b"], None]
+    assert df["link_count"].tolist() == [2, 0]
+
+
+def test_convert_2_timestamp_local_time():
+    # one winter and one summer time, so DST shifts are covered
+    times = ["1579000000.5", 0, "1594000000"]
+    out = convert_2_timestamp("ts", pd.DataFrame({"ts": times}))
+
+    expected = [
+        datetime.datetime.fromtimestamp(1579000000.5).strftime("%Y-%m-%d %H:%M:%S"),
+        0,
+        datetime.datetime.fromtimestamp(1594000000).strftime("%Y-%m-%d %H:%M:%S"),
+    ]
+    assert out == expected
+
+
+@pytest.mark.skipif(not hasattr(time, "tzset"), reason="needs time.tzset")
+@pytest.mark.parametrize("tz", ["UTC", "America/New_York", "Australia/Lord_Howe"])
+def test_convert_2_timestamp_across_dst(monkeypatch, tz):
+    monkeypatch.setenv("TZ", tz)
+    time.tzset()
+    try:
+        # every 7 minutes over four days around the 2020 US and Lord Howe
+        # DST switches, plus a fractional second that rounds like fromtimestamp
+        times = [str(t) for t in range(1583400000, 1583750000, 420)]
+        times += [str(t) for t in range(1585900000, 1586250000, 420)]
+        times.append("1583600000.9999996")
+        out = convert_2_timestamp("ts", pd.DataFrame({"ts": times}))
+
+        expected = [
+            datetime.datetime.fromtimestamp(float(t)).strftime("%Y-%m-%d %H:%M:%S")
+            for t in times
+        ]
+        assert out == expected
+    finally:
+        monkeypatch.undo()
+        time.tzset()
+
+
+def _user_profile():
+    return pd.DataFrame({
+        "id": ["U1", "U2", "U3"],
+        "profile": [{"real_name": "Ann"}, {"real_name": "Bo"}, {"real_name": "Cy"}],
+    })
+
+
+def test_map_userid_2_realname_return_ax():
+    matplotlib = pytest.importorskip("matplotlib")
+    matplotlib.use("Agg")
+
+    df, ax = map_userid_2_realname(
+        _user_profile(), {"U1": 3, "U2": 5}, plot=True, return_ax=True
+    )
+
+    assert df["LearnerName"].tolist() == ["Bo", "Ann"]
+    assert ax.get_title() == "Student based on Message sent in thread"
+
+
+def test_map_userid_2_realname_return_ax_without_plot():
+    df, ax = map_userid_2_realname(_user_profile(), {"U1": 3}, return_ax=True)
+
+    assert df["LearnerName"].tolist() == ["Ann"]
+    assert ax is None
+
+
+def test_map_userid_2_realname_top_n():
+    comm_dict = {"U1": 3, "U2": 5, "U3": 1}
+
+    top = map_userid_2_realname(_user_profile(), comm_dict, top_n=2)
+    assert top["LearnerName"].tolist() == ["Bo", "Ann"]
+
+    assert map_userid_2_realname(_user_profile(), comm_dict, top_n=0).empty
+
+
+def test_map_userid_2_realname_drops_unknown_ids():
+    df = map_userid_2_realname(_user_profile(), {"U1": 3, "U3": 5, "U9": 1})
+
+    assert df["LearnerName"].tolist() == ["Cy", "Ann"]
+    assert df["# of Msg sent in Threads"].tolist() == [5, 3]
+
+
+def test_get_tagged_users_handles_missing_content():
+    df = pd.DataFrame({"msg_content": ["hi <@U12> and @U3x", None, "no mentions"]})
+
+    assert get_tagged_users(df).tolist() == [["@U12", "@U3x"], [], []]
+
+
+def test_get_messages_from_channel(tmp_path):
+    day1 = [_msg(client_msg_id="a1"), _msg(client_msg_id="a2")]
+    day2 = [_msg(client_msg_id="b1"), _msg(client_msg_id="b2", subtype="channel_join")]
+    (tmp_path / "2020-01-01.json").write_text(json.dumps(day1))
+    (tmp_path / "2020-01-02.json").write_text(json.dumps(day2))
+    (tmp_path / "notes.txt").write_text("not json")
+
+    df = get_messages_from_channel(str(tmp_path))
+
+    assert len(df) == 3
+    assert sorted(df["msg_id"]) == ["a1", "a2", "b1"]
+    assert df.index.tolist() == [0, 1, 2]
+
+
+def test_get_messages_from_channel_empty_dir(tmp_path):
+    df = get_messages_from_channel(str(tmp_path))
+
+    assert df.empty
+    assert "msg_id" in df.columns
+
+
+def test_from_msg_get_replies_does_not_mutate_input():
+    reply = {"user": "U2", "ts": "1600000001.0"}
+    msg = _msg(thread_ts="1600000000.0", replies=[reply])
+
+    replies = from_msg_get_replies(msg)
+
+    assert replies == [{
+        "user": "U2",
+        "ts": "1600000001.0",
+        "thread_ts": "1600000000.0",
+        "message_id": "m1",
+    }]
+    assert reply == {"user": "U2", "ts": "1600000001.0"}
+    assert replies[0] is not reply
+
+
+def test_from_msg_get_replies_without_client_msg_id():
+    msg = _msg(thread_ts="1600000000.0", replies=[{"user": "U2"}])
+    del msg["client_msg_id"]
+
+    replies = from_msg_get_replies(msg)
+
+    assert replies == [{"user": "U2", "thread_ts": "1600000000.0", "message_id": None}]
+
+
+def test_from_msg_get_replies_not_a_thread():
+    assert from_msg_get_replies(_msg()) == []
+    assert from_msg_get_replies(_msg(replies=[{"user": "U2"}])) == []
+
+
+class _FakeStopwords:
+    def __init__(self, words=None):
+        self.words_ = words
+        self.calls = 0
+
+    def words(self, lang):
+        self.calls += 1
+        if self.words_ is None:
+            raise LookupError("stopwords corpus not found")
+        return self.words_
+
+
+def test_get_stopwords_cached(monkeypatch):
+    corpus = pytest.importorskip("nltk.corpus")
+    fake = _FakeStopwords(["the", "a"])
+    monkeypatch.setattr(corpus, "stopwords", fake)
+    monkeypatch.setattr(utils, "_STOPWORDS", None)
+
+    assert get_stopwords() == frozenset({"the", "a"})
+    assert get_stopwords() is get_stopwords()
+    assert fake.calls == 1
+
+
+def test_get_stopwords_missing_corpus_retries(monkeypatch):
+    corpus = pytest.importorskip("nltk.corpus")
+    fake = _FakeStopwords()
+    monkeypatch.setattr(corpus, "stopwords", fake)
+    monkeypatch.setattr(utils, "_STOPWORDS", None)
+
+    assert get_stopwords() == frozenset()
+    assert get_stopwords() == frozenset()
+    assert fake.calls == 2
+
+    fake.words_ = ["the"]
+    assert get_stopwords() == frozenset({"the"})
+    assert fake.calls == 3